@@ -19,15 +19,16 @@
 Converts a SPIR-V assembly shader job (all shaders are already disassembled) to an Amber script file.
 """
 
+import functools
 import itertools
 import json
 import pathlib
 import re
 from copy import copy
-from dataclasses import dataclass
+from dataclasses import astuple, dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Match, Optional
+from typing import Any, Dict, List, Match, Optional, Sequence, TextIO, Tuple
 
 from gfauto import binaries_util, shader_job_util, subprocess_util, util
 from gfauto.gflogging import log
@@ -35,6 +36,66 @@ from gfauto.util import check
 
 AMBER_FENCE_TIMEOUT_MS = 60000
 
+AMBER_SCRIPT_SHEBANG = "#!amber\n"
+
+AMBER_SET_FENCE_TIMEOUT_COMMAND = (
+    f"\nSET ENGINE_DATA fence_timeout_ms {AMBER_FENCE_TIMEOUT_MS}\n"
+)
+
+AMBER_FRAMEBUFFER_SIZE_COMMAND = "  FRAMEBUFFER_SIZE 256 256\n"
+
+# Maps GLSL SSBO field types to Amber data types.
+SSBO_TYPES: Dict[str, str] = {
+    "int": "int32",
+    "ivec2": "vec2<int32>",
+    "ivec3": "vec3<int32>",
+    "ivec4": "vec4<int32>",
+    "uint": "uint32",
+    "float": "float",
+    "vec2": "vec2<float>",
+    "vec3": "vec3<float>",
+    "vec4": "vec4<float>",
+}
+
+# Maps uniform functions (from the shader job JSON) to Amber data types.
+UNIFORM_TYPES: Dict[str, str] = {
+    "glUniform1f": "float",
+    "glUniform2f": "vec2<float>",
+    "glUniform3f": "vec3<float>",
+    "glUniform4f": "vec4<float>",
+    "glUniform1i": "int32",
+    "glUniform2i": "vec2<int32>",
+    "glUniform3i": "vec3<int32>",
+    "glUniform4i": "vec4<int32>",
+    "glUniform1ui": "uint32",
+    "glUniform2ui": "vec2<uint32>",
+    "glUniform3ui": "vec3<uint32>",
+    "glUniform4ui": "vec4<uint32>",
+    "glUniform1fv": "float[]",
+    "glUniform2fv": "vec2<float>[]",
+    "glUniform3fv": "vec3<float>[]",
+    "glUniform4fv": "vec4<float>[]",
+    "glUniform1iv": "int32[]",
+    "glUniform2iv": "vec2<int32>[]",
+    "glUniform3iv": "vec3<int32>[]",
+    "glUniform4iv": "vec4<int32>[]",
+    "glUniform1uiv": "int32[]",
+    "glUniform2uiv": "vec2<uint32>[]",
+    "glUniform3uiv": "vec3<uint32>[]",
+    "glUniform4uiv": "vec4<uint32>[]",
+    "glUniformMatrix2fv": "mat2x2<float>[]",
+    "glUniformMatrix3fv": "mat3x3<float>[]",
+    "glUniformMatrix4fv": "mat4x4<float>[]",
+    "glUniformMatrix2x3fv": "mat2x3<float>[]",
+    "glUniformMatrix3x2fv": "mat3x2<float>[]",
+    "glUniformMatrix2x4fv": "mat2x4<float>[]",
+    "glUniformMatrix4x2fv": "mat4x2<float>[]",
+    "glUniformMatrix3x4fv": "mat3x4<float>[]",
+    "glUniformMatrix4x3fv": "mat4x3<float>[]",
+    "sampler2D": "sampler",
+    "sampler3D": "sampler",
+}
+
 
 @dataclass
 class AmberfySettings:  # pylint: disable=too-many-instance-attributes
@@ -55,7 +116,7 @@ class AmberfySettings:  # pylint: disable=too-many-instance-attributes
 
 
 def get_spirv_opt_args_comment(
-    spirv_opt_args: List[str], spirv_opt_hash: Optional[str]
+    spirv_opt_args: Sequence[str], spirv_opt_hash: Optional[str]
 ) -> str:
     if not spirv_opt_args:
         return ""
@@ -69,19 +130,12 @@ def get_spirv_opt_args_comment(
 
 
 def get_text_as_comment(text: str) -> str:
-    lines = text.split("\n")
-
     # Remove empty lines from start and end.
-    while not lines[0]:
-        lines.pop(0)
-    while not lines[-1]:
-        lines.pop()
-
-    lines = [("# " + line).rstrip() for line in lines]
-    return "\n".join(lines)
+    lines = text.strip("\n").split("\n")
+    return "\n".join(("# " + line).rstrip() for line in lines)
 
 
-def amberscript_comp_buffer_bind(comp_json: str) -> str:
+def amberscript_comp_buffer_bind(comp: Dict[str, Any]) -> str:
     """
     Returns a string (template) containing an AmberScript command for binding the in/out buffer.
 
@@ -113,20 +167,22 @@ def amberscript_comp_buffer_bind(comp_json: str) -> str:
       BIND BUFFER {} AS storage DESCRIPTOR_SET 0 BINDING 123
 
     The string template argument (use `format()`) is the name of the SSBO buffer.
-    """
-    comp = json.loads(comp_json)
 
+    :param comp: The parsed shader job JSON.
+    """
     check(
-        "$compute" in comp.keys(),
+        "$compute" in comp,
         AssertionError("Cannot find '$compute' key in JSON file"),
     )
 
     compute_info = comp["$compute"]
-    assert "binding" in compute_info["buffer"].keys()
+    assert "binding" in compute_info["buffer"]
     return f"  BIND BUFFER {{}} AS storage DESCRIPTOR_SET 0 BINDING {compute_info['buffer']['binding']}\n"
 
 
-def amberscript_comp_buff_def(comp_json: str, make_empty_buffer: bool = False) -> str:
+def amberscript_comp_buff_def(
+    comp: Dict[str, Any], make_empty_buffer: bool = False
+) -> str:
     """
     Returns a string (template) containing AmberScript commands for defining the initial in/out buffer.
 
@@ -164,83 +220,64 @@ def amberscript_comp_buff_def(comp_json: str, make_empty_buffer: bool = False) -
       BUFFER {} DATA_TYPE int SIZE 3 0
 
 
-    :param comp_json: The shader job JSON as a string.
+    :param comp: The parsed shader job JSON.
     :param make_empty_buffer: If true, an "empty" buffer is created that is of the same size and type as the normal
     in/out buffer; the empty buffer can be used to store the contents of the in/out buffer via the Amber COPY command.
     The only difference is the "empty" buffer is initially filled with just one value, which avoids redundantly
     listing hundreds of values that will just be overwritten, and makes it clear(er) for those reading the AmberScript
     file that the initial state of the buffer is unused.
     """
-    ssbo_types = {
-        "int": "int32",
-        "ivec2": "vec2<int32>",
-        "ivec3": "vec3<int32>",
-        "ivec4": "vec4<int32>",
-        "uint": "uint32",
-        "float": "float",
-        "vec2": "vec2<float>",
-        "vec3": "vec3<float>",
-        "vec4": "vec4<float>",
-    }
-
-    comp = json.loads(comp_json)
-
     check(
-        "$compute" in comp.keys(),
+        "$compute" in comp,
         AssertionError("Cannot find '$compute' key in JSON file"),
     )
 
     compute_info = comp["$compute"]
+    fields = compute_info["buffer"]["fields"]
 
     check(
-        len(compute_info["buffer"]["fields"]) > 0,
+        len(fields) > 0,
         AssertionError("Compute shader test with empty SSBO"),
     )
 
-    field_types_set = {field["type"] for field in compute_info["buffer"]["fields"]}
+    ssbo_type = fields[0]["type"]
 
-    check(len(field_types_set) == 1, AssertionError("All field types must be the same"))
+    check(
+        all(field["type"] == ssbo_type for field in fields),
+        AssertionError("All field types must be the same"),
+    )
 
-    ssbo_type = compute_info["buffer"]["fields"][0]["type"]
-    if ssbo_type not in ssbo_types.keys():
+    ssbo_type_amber = SSBO_TYPES.get(ssbo_type)
+    if ssbo_type_amber is None:
         raise ValueError(f"Unsupported SSBO datum type: {ssbo_type}")
-    ssbo_type_amber = ssbo_types[ssbo_type]
 
-    # E.g. [[0, 0], [5], [1, 2, 3]]
-    field_data = [field["data"] for field in compute_info["buffer"]["fields"]]
-
-    # E.g. [0, 0, 5, 1, 2, 3]
-    # |*| unpacks the list so each element is passed as an argument.
-    # |chain| takes a list of iterables and concatenates them.
-    field_data_flattened = itertools.chain(*field_data)
-
-    # E.g. ["0", "0", "5", "1", "2", "3"]
-    field_data_flattened_str = [str(field) for field in field_data_flattened]
+    # E.g. [[0, 0], [5], [1, 2, 3]] becomes [0, 0, 5, 1, 2, 3]
+    # |chain.from_iterable| lazily concatenates the iterables, so we avoid building an intermediate list of the
+    # per-field data and unpacking it as arguments.
+    field_data_flattened = list(
+        itertools.chain.from_iterable(field["data"] for field in fields)
+    )
 
-    result = ""
     if make_empty_buffer:
         # We just use the first value to initialize every element of the "empty" buffer.
-        result += f"BUFFER {{}} DATA_TYPE {ssbo_type_amber} SIZE {len(field_data_flattened_str)} {field_data_flattened_str[0]}\n"
-    else:
-        result += f"BUFFER {{}} DATA_TYPE {ssbo_type_amber} DATA\n"
-        result += f" {' '.join(field_data_flattened_str)}\n"
-        result += "END\n"
+        return f"BUFFER {{}} DATA_TYPE {ssbo_type_amber} SIZE {len(field_data_flattened)} {field_data_flattened[0]}\n"
 
-    return result
+    # E.g. "0 0 5 1 2 3"
+    body = " ".join(map(str, field_data_flattened))
+    return f"BUFFER {{}} DATA_TYPE {ssbo_type_amber} DATA\n {body}\nEND\n"
 
 
-def amberscript_comp_num_groups_def(json_contents: str) -> str:
-    shader_job_info = json.loads(json_contents)
+def amberscript_comp_num_groups_def(shader_job_info: Dict[str, Any]) -> str:
     num_groups = shader_job_info["$compute"]["num_groups"]
     num_groups_str = [str(dimension) for dimension in num_groups]
     return " ".join(num_groups_str)
 
 
-def amberscript_uniform_buffer_bind(uniform_json: str, prefix: str) -> str:
+def amberscript_uniform_buffer_bind(uniforms: Dict[str, Any], prefix: str) -> str:
     """
     Returns AmberScript commands for uniform binding.
 
-    Skips the special '$...' keys, if present.
+    The special '$...' keys (e.g. "$compute") must have already been removed.
 
     {
       "myuniform": {
@@ -257,8 +294,7 @@ def amberscript_uniform_buffer_bind(uniform_json: str, prefix: str) -> str:
         "func": "sampler2D",
         "texture": "DEFAULT",
         "binding": 7
-      },
-      "$compute": { ... will be ignored ... }
+      }
     }
 
     becomes:
@@ -269,20 +305,17 @@ def amberscript_uniform_buffer_bind(uniform_json: str, prefix: str) -> str:
 
     """
     result = ""
-    uniforms = json.loads(uniform_json)
     for name, entry in uniforms.items():
-        if name.startswith("$"):
-            continue
         if entry["func"] in ["sampler2D", "sampler3D"]:
-            assert "texture" in entry.keys()
+            assert "texture" in entry
             if entry["texture"] == "DEFAULT":
                 result += f"  BIND BUFFER default_texture AS combined_image_sampler SAMPLER {prefix}_{name} DESCRIPTOR_SET 0 BINDING {entry['binding']}\n"
             else:
                 raise AssertionError("Non-default textures not implemented")
-        elif "binding" in entry.keys():
-            assert "push_constant" not in entry.keys()
+        elif "binding" in entry:
+            assert "push_constant" not in entry
             result += f"  BIND BUFFER {prefix}_{name} AS uniform DESCRIPTOR_SET 0 BINDING {entry['binding']}\n"
-        elif "push_constant" in entry.keys():
+        elif "push_constant" in entry:
             result += f"  BIND BUFFER {prefix}_{name} AS push_constant\n"
         else:
             AssertionError("Uniform should have 'binding' or 'push_constant' field")
@@ -290,11 +323,12 @@ def amberscript_uniform_buffer_bind(uniform_json: str, prefix: str) -> str:
     return result
 
 
-def amberscript_uniform_buffer_def(uniform_json_contents: str, prefix: str) -> str:
+def amberscript_uniform_buffer_def(uniforms: Dict[str, Any], prefix: str) -> str:
     """
     Returns the string representing AmberScript version of uniform definitions.
 
-    Skips the special '$...' keys, if present.
+    The special '$...' keys (e.g. "$compute") must have already been removed. The "uniforms for" comment is
+    generated even if there are no uniforms.
 
     {
       "myuniform": {
@@ -311,8 +345,7 @@ def amberscript_uniform_buffer_def(uniform_json_contents: str, prefix: str) -> s
         "func": "sampler2D",
         "texture": "DEFAULT",
         "binding": 5
-      },
-      "$compute": { ... will be ignored ... }
+      }
     }
 
     becomes:
@@ -332,67 +365,20 @@ def amberscript_uniform_buffer_def(uniform_json_contents: str, prefix: str) -> s
     # mysampler
     SAMPLER {prefix}_mysampler
 
-    :param uniform_json_contents:
+    :param uniforms: The parsed shader job JSON.
     :param prefix: E.g. "reference" or "variant". The buffer names will include this prefix to avoid name
     clashes.
     """
-    uniform_types: Dict[str, str] = {
-        "glUniform1f": "float",
-        "glUniform2f": "vec2<float>",
-        "glUniform3f": "vec3<float>",
-        "glUniform4f": "vec4<float>",
-        "glUniform1i": "int32",
-        "glUniform2i": "vec2<int32>",
-        "glUniform3i": "vec3<int32>",
-        "glUniform4i": "vec4<int32>",
-        "glUniform1ui": "uint32",
-        "glUniform2ui": "vec2<uint32>",
-        "glUniform3ui": "vec3<uint32>",
-        "glUniform4ui": "vec4<uint32>",
-        "glUniform1fv": "float[]",
-        "glUniform2fv": "vec2<float>[]",
-        "glUniform3fv": "vec3<float>[]",
-        "glUniform4fv": "vec4<float>[]",
-        "glUniform1iv": "int32[]",
-        "glUniform2iv": "vec2<int32>[]",
-        "glUniform3iv": "vec3<int32>[]",
-        "glUniform4iv": "vec4<int32>[]",
-        "glUniform1uiv": "int32[]",
-        "glUniform2uiv": "vec2<uint32>[]",
-        "glUniform3uiv": "vec3<uint32>[]",
-        "glUniform4uiv": "vec4<uint32>[]",
-        "glUniformMatrix2fv": "mat2x2<float>[]",
-        "glUniformMatrix3fv": "mat3x3<float>[]",
-        "glUniformMatrix4fv": "mat4x4<float>[]",
-        "glUniformMatrix2x3fv": "mat2x3<float>[]",
-        "glUniformMatrix3x2fv": "mat3x2<float>[]",
-        "glUniformMatrix2x4fv": "mat2x4<float>[]",
-        "glUniformMatrix4x2fv": "mat4x2<float>[]",
-        "glUniformMatrix3x4fv": "mat3x4<float>[]",
-        "glUniformMatrix4x3fv": "mat4x3<float>[]",
-        "sampler2D": "sampler",
-        "sampler3D": "sampler",
-    }
-
-    uniforms = json.loads(uniform_json_contents)
-
-    # If there are no uniforms, do not generate anything.
-    if not uniforms:
-        return ""
-
     result = f"# uniforms for {prefix}\n"
 
     result += "\n"
 
     for name, entry in uniforms.items():
 
-        if name.startswith("$"):
-            continue
-
         func = entry["func"]
-        if func not in uniform_types.keys():
+        uniform_type = UNIFORM_TYPES.get(func)
+        if uniform_type is None:
             raise ValueError("Error: unknown uniform type for function: " + func)
-        uniform_type = uniform_types[func]
 
         if uniform_type == "sampler":
             result += f"# {name}\n"
@@ -401,20 +387,12 @@ def amberscript_uniform_buffer_def(uniform_json_contents: str, prefix: str) -> s
         else:
             result += f"# {name}\n"
             result += f"BUFFER {prefix}_{name} DATA_TYPE {uniform_type} STD140 DATA\n"
-            for arg in entry["args"]:
-                result += f" {arg}"
-            result += "\n"
+            result += " " + " ".join(map(str, entry["args"])) + "\n"
             result += "END\n"
 
     return result
 
 
-def translate_type_for_amber(type_name: str) -> str:
-    if type_name == "bool":
-        return "uint"
-    return type_name
-
-
 def is_compute_job(input_asm_spirv_job_json_path: pathlib.Path) -> bool:
     comp_files = shader_job_util.get_related_files(
         input_asm_spirv_job_json_path,
@@ -428,9 +406,8 @@ def is_compute_job(input_asm_spirv_job_json_path: pathlib.Path) -> bool:
     return len(comp_files) == 1
 
 
-def derive_draw_command(json_contents: str) -> str:
-    shader_job_info = json.loads(json_contents)
-    if "$grid" in shader_job_info.keys():
+def derive_draw_command(shader_job_info: Dict[str, Any]) -> str:
+    if "$grid" in shader_job_info:
         cols = shader_job_info["$grid"]["dimensions"][0]
         rows = shader_job_info["$grid"]["dimensions"][1]
         return f"DRAW_GRID POS 0 0 SIZE 256 256 CELLS {cols} {rows}"
@@ -445,6 +422,8 @@ class ShaderType(Enum):
 
 @dataclass
 class Shader:
+    __slots__ = ("shader_type", "shader_spirv_asm", "shader_source", "processing_info")
+
     shader_type: ShaderType
     shader_spirv_asm: Optional[str]
     shader_source: Optional[str]
@@ -453,6 +432,8 @@ class Shader:
 
 @dataclass
 class ShaderJob:
+    __slots__ = ("name_prefix", "uniform_definitions", "uniform_bindings")
+
     name_prefix: str  # Can be used to create unique ssbo buffer names; uniform names are already unique.
     uniform_definitions: str  # E.g. BUFFER reference_resolution DATA_TYPE vec2<float> DATA 256.0 256.0 END ...
     uniform_bindings: str  # E.g. BIND BUFFER reference_resolution AS uniform DESCRIPTOR_SET 0 BINDING 2 ...
@@ -460,6 +441,13 @@ class ShaderJob:
 
 @dataclass
 class ComputeShaderJob(ShaderJob):
+    __slots__ = (
+        "compute_shader",
+        "initial_buffer_definition_template",
+        "empty_buffer_definition_template",
+        "num_groups_def",
+        "buffer_binding_template",
+    )
 
     compute_shader: Shader
 
@@ -484,6 +472,8 @@ class ComputeShaderJob(ShaderJob):
 
 @dataclass
 class GraphicsShaderJob(ShaderJob):
+    __slots__ = ("vertex_shader", "fragment_shader", "draw_command")
+
     vertex_shader: Shader
     fragment_shader: Shader
     draw_command: str
@@ -491,13 +481,39 @@ class GraphicsShaderJob(ShaderJob):
 
 @dataclass
 class ShaderJobFile:
+    __slots__ = (
+        "name_prefix",
+        "asm_spirv_shader_job_json",
+        "glsl_source_json",
+        "processing_info",
+    )
+
     name_prefix: str  # Uniform names will be prefixed with this name to ensure they are unique. E.g. "reference".
     asm_spirv_shader_job_json: Path
     glsl_source_json: Optional[Path]
     processing_info: str  # E.g. "optimized with spirv-opt -O"
 
     def to_shader_job(self) -> ShaderJob:
-        json_contents = util.file_read_text(self.asm_spirv_shader_job_json)
+        # Parse the shader job JSON once; it is needed by several of the functions below.
+        shader_job_info = json.loads(
+            util.file_read_text(self.asm_spirv_shader_job_json)
+        )
+
+        # Filter out the special '$...' keys (e.g. "$compute") once, leaving just the uniforms.
+        uniforms = {
+            name: entry
+            for name, entry in shader_job_info.items()
+            if not name.startswith("$")
+        }
+
+        # Uniform definitions are omitted only if the shader job JSON is completely empty; a shader job with just
+        # special keys (e.g. "$compute") still gets an empty "uniforms for" section.
+        uniform_definitions = (
+            amberscript_uniform_buffer_def(uniforms, self.name_prefix)
+            if shader_job_info
+            else ""
+        )
+        uniform_bindings = amberscript_uniform_buffer_bind(uniforms, self.name_prefix)
 
         if is_compute_job(self.asm_spirv_shader_job_json):
             glsl_comp_contents = None
@@ -517,18 +533,18 @@ class ShaderJobFile:
 
             return ComputeShaderJob(
                 self.name_prefix,
-                amberscript_uniform_buffer_def(json_contents, self.name_prefix),
-                amberscript_uniform_buffer_bind(json_contents, self.name_prefix),
+                uniform_definitions,
+                uniform_bindings,
                 Shader(
                     ShaderType.COMPUTE,
                     comp_asm_contents,
                     glsl_comp_contents,
                     self.processing_info,
                 ),
-                amberscript_comp_buff_def(json_contents),
-                amberscript_comp_buff_def(json_contents, make_empty_buffer=True),
-                amberscript_comp_num_groups_def(json_contents),
-                amberscript_comp_buffer_bind(json_contents),
+                amberscript_comp_buff_def(shader_job_info),
+                amberscript_comp_buff_def(shader_job_info, make_empty_buffer=True),
+                amberscript_comp_num_groups_def(shader_job_info),
+                amberscript_comp_buffer_bind(shader_job_info),
             )
 
         # Get GLSL contents
@@ -557,12 +573,12 @@ class ShaderJobFile:
         )
 
         # Figure out if we want to draw a rectangle or a grid.
-        draw_command = derive_draw_command(json_contents)
+        draw_command = derive_draw_command(shader_job_info)
 
         return GraphicsShaderJob(
             self.name_prefix,
-            amberscript_uniform_buffer_def(json_contents, self.name_prefix),
-            amberscript_uniform_buffer_bind(json_contents, self.name_prefix),
+            uniform_definitions,
+            uniform_bindings,
             Shader(
                 ShaderType.VERTEX,
                 vert_contents,
@@ -581,12 +597,16 @@ class ShaderJobFile:
 
 @dataclass
 class ShaderJobBasedAmberTest:
+    __slots__ = ("reference", "variants")
+
     reference: Optional[ShaderJob]
     variants: List[ShaderJob]
 
 
 @dataclass
 class ShaderJobFileBasedAmberTest:
+    __slots__ = ("reference_asm_spirv_job", "variants_asm_spirv_job")
+
     reference_asm_spirv_job: Optional[ShaderJobFile]
     variants_asm_spirv_job: List[ShaderJobFile]
 
@@ -604,48 +624,60 @@ class ShaderJobFileBasedAmberTest:
 
 
 def get_amber_script_header(amberfy_settings: AmberfySettings) -> str:
-    result = "#!amber\n"
+    # The same settings are typically used for many shader jobs, so the header is cached. The cache key contains
+    # every settings field, with lists (i.e. |spirv_opt_args|) converted to tuples so that the key can be hashed.
+    settings_key = tuple(
+        tuple(value) if isinstance(value, list) else value
+        for value in astuple(amberfy_settings)
+    )
+    return _render_header(settings_key)
+
+
+@functools.lru_cache(maxsize=32)
+def _render_header(settings_key: Tuple[Any, ...]) -> str:
+    amberfy_settings = AmberfySettings(*settings_key)
+
+    parts: List[str] = [AMBER_SCRIPT_SHEBANG]
 
     if amberfy_settings.copyright_header_text:
-        result += "\n"
-        result += get_text_as_comment(amberfy_settings.copyright_header_text)
-        result += "\n\n"
+        parts.append(
+            f"\n{get_text_as_comment(amberfy_settings.copyright_header_text)}\n\n"
+        )
 
     if amberfy_settings.add_generated_comment:
-        result += "\n# Generated.\n\n"
+        parts.append("\n# Generated.\n\n")
 
     if amberfy_settings.add_graphics_fuzz_comment:
         if amberfy_settings.is_coverage_gap:
-            result += (
+            parts.append(
                 "\n# A test for a coverage-gap found by the GraphicsFuzz project.\n"
             )
         else:
-            result += "\n# A test for a bug found by the GraphicsFuzz project.\n"
+            parts.append("\n# A test for a bug found by the GraphicsFuzz project.\n")
 
     if amberfy_settings.short_description:
-        result += f"\n# Short description: {amberfy_settings.short_description}\n"
+        parts.append(f"\n# Short description: {amberfy_settings.short_description}\n")
 
     if amberfy_settings.comment_text:
-        result += f"\n{get_text_as_comment(amberfy_settings.comment_text)}\n"
+        parts.append(f"\n{get_text_as_comment(amberfy_settings.comment_text)}\n")
 
     if amberfy_settings.spirv_opt_args:
-        result += "\n"
-        result += get_spirv_opt_args_comment(
+        spirv_opt_args_comment = get_spirv_opt_args_comment(
             amberfy_settings.spirv_opt_args, amberfy_settings.spirv_opt_hash
         )
-        result += "\n"
+        parts.append(f"\n{spirv_opt_args_comment}\n")
 
     if not amberfy_settings.use_default_fence_timeout:
-        result += f"\nSET ENGINE_DATA fence_timeout_ms {AMBER_FENCE_TIMEOUT_MS}\n"
+        parts.append(AMBER_SET_FENCE_TIMEOUT_COMMAND)
 
-    return result
+    return "".join(parts)
 
 
 def get_amber_script_shader_def(shader: Shader, name: str) -> str:
-    result = ""
+    parts: List[str] = []
     if shader.shader_source:
-        result += f"\n# {name} is derived from the following GLSL:\n"
-        result += get_text_as_comment(shader.shader_source)
+        parts.append(f"\n# {name} is derived from the following GLSL:\n")
+        parts.append(get_text_as_comment(shader.shader_source))
     if shader.shader_spirv_asm:
         groups = re.findall(r"\n; Version: ([\d.]*)", shader.shader_spirv_asm)
         check(
@@ -655,56 +687,66 @@ def get_amber_script_shader_def(shader: Shader, name: str) -> str:
             ),
         )
         spirv_version = groups[0]
-        result += f"\nSHADER {str(shader.shader_type.value)} {name} SPIRV-ASM TARGET_ENV spv{spirv_version}\n"
-        result += shader.shader_spirv_asm
-        result += "END\n"
+        parts.append(
+            f"\nSHADER {str(shader.shader_type.value)} {name} SPIRV-ASM TARGET_ENV spv{spirv_version}\n"
+        )
+        parts.append(shader.shader_spirv_asm)
+        parts.append("END\n")
     else:
-        result += f"\nSHADER {str(shader.shader_type.value)} {name} PASSTHROUGH\n"
-
-    return result
+        parts.append(f"\nSHADER {str(shader.shader_type.value)} {name} PASSTHROUGH\n")
+
+    return "".join(parts)
+
+
+AMBER_TEXTURE_GENERATION_SHADER_DEF = (
+    "\nSHADER vertex texgen_vert PASSTHROUGH\n"
+    "\n"
+    "SHADER fragment texgen_frag GLSL\n"
+    "#version 430\n"
+    "precision highp float;\n"
+    "\n"
+    "layout(location = 0) out vec4 _GLF_color;\n"
+    "\n"
+    "void main()\n"
+    "{\n"
+    " _GLF_color = vec4(\n"
+    " gl_FragCoord.x * (1.0 / 256.0),\n"
+    " (int(gl_FragCoord.x) ^ int(gl_FragCoord.y)) * (1.0 / 256.0),\n"
+    " gl_FragCoord.y * (1.0 / 256.0),\n"
+    " 1.0);\n"
+    "}\n"
+    "END\n"
+)
 
 
 def get_amber_texture_generation_shader_def() -> str:
-    result = ""
-    result += "\nSHADER vertex texgen_vert PASSTHROUGH\n"
-    result += "\n"
-    result += "SHADER fragment texgen_frag GLSL\n"
-    result += "#version 430\n"
-    result += "precision highp float;\n"
-    result += "\n"
-    result += "layout(location = 0) out vec4 _GLF_color;\n"
-    result += "\n"
-    result += "void main()\n"
-    result += "{\n"
-    result += " _GLF_color = vec4(\n"
-    result += " gl_FragCoord.x * (1.0 / 256.0),\n"
-    result += " (int(gl_FragCoord.x) ^ int(gl_FragCoord.y)) * (1.0 / 256.0),\n"
-    result += " gl_FragCoord.y * (1.0 / 256.0),\n"
-    result += " 1.0);\n"
-    result += "}\n"
-    result += "END\n"
-    return result
+    return AMBER_TEXTURE_GENERATION_SHADER_DEF
+
+
+AMBER_TEXTURE_GENERATION_PIPELINE_DEF = (
+    "BUFFER default_texture FORMAT B8G8R8A8_UNORM\n"
+    "\n"
+    "PIPELINE graphics texgen_pipeline\n"
+    "  ATTACH texgen_vert\n"
+    "  ATTACH texgen_frag\n"
+    f"{AMBER_FRAMEBUFFER_SIZE_COMMAND}"
+    "  BIND BUFFER default_texture AS color LOCATION 0\n"
+    "END\n"
+)
 
 
 def get_amber_texture_generation_pipeline_def() -> str:
-    result = ""
-    result += "BUFFER default_texture FORMAT B8G8R8A8_UNORM\n"
-    result += "\n"
-    result += "PIPELINE graphics texgen_pipeline\n"
-    result += "  ATTACH texgen_vert\n"
-    result += "  ATTACH texgen_frag\n"
-    result += "  FRAMEBUFFER_SIZE 256 256\n"
-    result += "  BIND BUFFER default_texture AS color LOCATION 0\n"
-    result += "END\n"
-    return result
+    return AMBER_TEXTURE_GENERATION_PIPELINE_DEF
 
 
 # noinspection DuplicatedCode
 def graphics_shader_job_amber_test_to_amber_script(
-    shader_job_amber_test: ShaderJobBasedAmberTest, amberfy_settings: AmberfySettings
-) -> str:
+    shader_job_amber_test: ShaderJobBasedAmberTest,
+    amberfy_settings: AmberfySettings,
+    output: TextIO,
+) -> None:
 
-    result = get_amber_script_header(amberfy_settings)
+    output.write(get_amber_script_header(amberfy_settings))
 
     jobs = shader_job_amber_test.variants.copy()
 
@@ -727,63 +769,69 @@ def graphics_shader_job_amber_test_to_amber_script(
 
         # Define shaders.
 
-        result += get_amber_script_shader_def(job.vertex_shader, vertex_shader_name)
+        output.write(get_amber_script_shader_def(job.vertex_shader, vertex_shader_name))
 
-        result += get_amber_script_shader_def(job.fragment_shader, fragment_shader_name)
+        output.write(
+            get_amber_script_shader_def(job.fragment_shader, fragment_shader_name)
+        )
 
         if texture_generation:
-            result += get_amber_texture_generation_shader_def()
+            output.write(get_amber_texture_generation_shader_def())
 
         # Define uniforms for shader job.
 
-        result += "\n"
-        result += job.uniform_definitions
+        output.write("\n")
+        output.write(job.uniform_definitions)
 
-        result += f"\nBUFFER {prefix}_framebuffer FORMAT B8G8R8A8_UNORM\n"
+        output.write(f"\nBUFFER {prefix}_framebuffer FORMAT B8G8R8A8_UNORM\n")
 
         if texture_generation:
-            result += get_amber_texture_generation_pipeline_def()
+            output.write(get_amber_texture_generation_pipeline_def())
 
         # Create a pipeline.
 
-        result += f"\nPIPELINE graphics {prefix}_pipeline\n"
-        result += f"  ATTACH {vertex_shader_name}\n"
-        result += f"  ATTACH {fragment_shader_name}\n"
-        result += "  FRAMEBUFFER_SIZE 256 256\n"
-        result += f"  BIND BUFFER {prefix}_framebuffer AS color LOCATION 0\n"
-        result += job.uniform_bindings
-        result += "END\n"
-        result += f"CLEAR_COLOR {prefix}_pipeline 0 0 0 255\n"
+        output.write(
+            f"\nPIPELINE graphics {prefix}_pipeline\n"
+            f"  ATTACH {vertex_shader_name}\n"
+            f"  ATTACH {fragment_shader_name}\n"
+            f"{AMBER_FRAMEBUFFER_SIZE_COMMAND}"
+            f"  BIND BUFFER {prefix}_framebuffer AS color LOCATION 0\n"
+        )
+        output.write(job.uniform_bindings)
+        output.write(f"END\nCLEAR_COLOR {prefix}_pipeline 0 0 0 255\n")
 
         # Run the pipeline.
 
         if texture_generation:
-            result += "\nCLEAR_COLOR texgen_pipeline 0 0 0 255\n"
-            result += "CLEAR texgen_pipeline\n"
-            result += "RUN texgen_pipeline DRAW_RECT POS 0 0  SIZE 256 256\n"
+            output.write(
+                "\nCLEAR_COLOR texgen_pipeline 0 0 0 255\n"
+                "CLEAR texgen_pipeline\n"
+                "RUN texgen_pipeline DRAW_RECT POS 0 0  SIZE 256 256\n"
+            )
 
-        result += f"\nCLEAR {prefix}_pipeline\n"
-        result += f"RUN {prefix}_pipeline {job.draw_command}\n"
-        result += "\n"
+        output.write(
+            f"\nCLEAR {prefix}_pipeline\nRUN {prefix}_pipeline {job.draw_command}\n\n"
+        )
 
     # Add fuzzy compare of framebuffers if there's more than one pipeline.
 
     for pipeline_index in range(1, len(jobs)):
         prefix_0 = jobs[0].name_prefix
         prefix_1 = jobs[pipeline_index].name_prefix
-        result += f"EXPECT {prefix_0}_framebuffer EQ_HISTOGRAM_EMD_BUFFER {prefix_1}_framebuffer TOLERANCE 0.005"
-        result += "\n"
+        output.write(
+            f"EXPECT {prefix_0}_framebuffer EQ_HISTOGRAM_EMD_BUFFER {prefix_1}_framebuffer TOLERANCE 0.005\n"
+        )
 
     if amberfy_settings.extra_commands:
-        result += amberfy_settings.extra_commands
-
-    return result
+        output.write(amberfy_settings.extra_commands)
 
 
 # noinspection DuplicatedCode
 def compute_shader_job_amber_test_to_amber_script(
-    shader_job_amber_test: ShaderJobBasedAmberTest, amberfy_settings: AmberfySettings
-) -> str:
+    shader_job_amber_test: ShaderJobBasedAmberTest,
+    amberfy_settings: AmberfySettings,
+    output: TextIO,
+) -> None:
 
     jobs = shader_job_amber_test.variants.copy()
 
@@ -791,7 +839,7 @@ def compute_shader_job_amber_test_to_amber_script(
         assert isinstance(shader_job_amber_test.reference, ComputeShaderJob)  # noqa
         jobs.insert(0, shader_job_amber_test.reference)
 
-    result = get_amber_script_header(amberfy_settings)
+    output.write(get_amber_script_header(amberfy_settings))
 
     for job in jobs:
         # Guaranteed, and needed for type checker.
@@ -804,42 +852,45 @@ def compute_shader_job_amber_test_to_amber_script(
 
         # Define shaders.
 
-        result += get_amber_script_shader_def(job.compute_shader, compute_shader_name)
+        output.write(
+            get_amber_script_shader_def(job.compute_shader, compute_shader_name)
+        )
 
         # Define uniforms for variant shader job.
 
-        result += "\n"
-        result += job.uniform_definitions
+        output.write("\n")
+        output.write(job.uniform_definitions)
 
         # Define in/out buffer for variant shader job.
         # Note that |initial_buffer_definition_template| is a string template that takes the buffer name as an argument.
 
-        result += "\n"
-        result += job.initial_buffer_definition_template.format(ssbo_name)
+        output.write("\n")
+        output.write(job.initial_buffer_definition_template.format(ssbo_name))
 
         # Create a pipeline that uses the variant compute shader and binds |variant_ssbo_name|.
 
-        result += f"\nPIPELINE compute {prefix}_pipeline\n"
-        result += f"  ATTACH {compute_shader_name}\n"
-        result += job.uniform_bindings
-        result += job.buffer_binding_template.format(ssbo_name)
-        result += "END\n"
+        output.write(
+            f"\nPIPELINE compute {prefix}_pipeline\n  ATTACH {compute_shader_name}\n"
+        )
+        output.write(job.uniform_bindings)
+        output.write(job.buffer_binding_template.format(ssbo_name))
+        output.write("END\n")
 
         # Run the pipeline.
 
-        result += f"\nRUN {prefix}_pipeline {job.num_groups_def}\n\n"
+        output.write(f"\nRUN {prefix}_pipeline {job.num_groups_def}\n\n")
 
     # Add fuzzy compare of result SSBOs if there's more than one pipeline.
 
     for pipeline_index in range(1, len(jobs)):
         prefix_0 = jobs[0].name_prefix
         prefix_1 = jobs[pipeline_index].name_prefix
-        result += f"EXPECT {prefix_0}_ssbo RMSE_BUFFER {prefix_1}_ssbo TOLERANCE 7\n"
+        output.write(
+            f"EXPECT {prefix_0}_ssbo RMSE_BUFFER {prefix_1}_ssbo TOLERANCE 7\n"
+        )
 
     if amberfy_settings.extra_commands:
-        result += amberfy_settings.extra_commands
-
-    return result
+        output.write(amberfy_settings.extra_commands)
 
 
 def spirv_asm_shader_job_to_amber_script(
@@ -861,20 +912,19 @@ def spirv_asm_shader_job_to_amber_script(
     shader_job_amber_test = shader_job_file_amber_test.to_shader_job_based()
 
     if isinstance(shader_job_amber_test.variants[0], GraphicsShaderJob):
-        result = graphics_shader_job_amber_test_to_amber_script(
-            shader_job_amber_test, amberfy_settings
-        )
-
+        amber_test_to_amber_script = graphics_shader_job_amber_test_to_amber_script
     elif isinstance(shader_job_amber_test.variants[0], ComputeShaderJob):
-        result = compute_shader_job_amber_test_to_amber_script(
-            shader_job_amber_test, amberfy_settings
-        )
+        amber_test_to_amber_script = compute_shader_job_amber_test_to_amber_script
     else:
         raise AssertionError(
             f"Unknown shader job type: {shader_job_amber_test.variants[0]}"
         )
 
-    util.file_write_text(output_amber_script_file_path, result)
+    # Stream the AmberScript to the file, rather than building the (potentially large) script as a single string.
+    # The file is written atomically so that an error while rendering does not leave a truncated script behind.
+    with util.file_open_text_atomic(output_amber_script_file_path) as output:
+        amber_test_to_amber_script(shader_job_amber_test, amberfy_settings, output)
+
     return output_amber_script_file_path
 
 
@@ -1042,7 +1092,7 @@ def extract_shaders(
     files_written: List[Path] = []
     with util.file_open_text(amber_file, "r") as file_handle:
         lines = file_handle.readlines()
-        if lines[0].startswith("#!amber"):
+        if lines[0].startswith(AMBER_SCRIPT_SHEBANG.rstrip()):
             files_written += extract_shaders_amber_script(
                 amber_file, lines, output_dir, binaries
             )
@@ -96,6 +96,28 @@ def file_write_text_atomic(file: Path, text: str) -> Path:  # noqa VNE002
     return file
 
 
+@contextmanager
+def file_open_text_atomic(file: Path) -> Iterator[TextIO]:  # noqa VNE002
+    """
+    Opens a temporary file alongside |file| for writing text; the temporary file is renamed to |file| when the context
+    exits normally. If an exception is raised, the temporary file is removed and |file| is left untouched.
+
+    :param file:
+    :return:
+    """
+    temp_file: Path = file.parent / get_random_name()
+    try:
+        with file_open_text(temp_file, "x") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # Will not fail if dest already exists; will just silently replace dest.
+        os.replace(str(temp_file), str(file))
+    finally:
+        if temp_file.exists():
+            temp_file.unlink()
+
+
 def file_write_text(file: pathlib.Path, text: str) -> Path:  # noqa VNE002
     with file_open_text(file, "w") as f:
         f.write(text)
@@ -341,7 +363,7 @@ def get_random_name() -> str:
 
 
 def update_gcov_environment_variable_if_needed() -> None:
-    if "GCOV_PREFIX" in os.environ.keys():
+    if "GCOV_PREFIX" in os.environ:
         gcov_prefix: str = os.environ["GCOV_PREFIX"]
         if "PROC_ID" in gcov_prefix:
             pid = str(os.getpid())
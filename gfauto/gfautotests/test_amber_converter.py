@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 The GraphicsFuzz Project Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from gfauto import amber_converter, util
+
+SPIRV_ASM = "; SPIR-V\n; Version: 1.0\nOpCapability Shader\n"
+
+
+def write_shader_job(
+    directory: Path, shader_job_info: Dict[str, Any], extensions: List[str]
+) -> amber_converter.ShaderJobFile:
+    json_path = directory / "variant.json"
+    util.file_write_text(json_path, json.dumps(shader_job_info))
+    for extension in extensions:
+        util.file_write_text(directory / f"variant{extension}.asm", SPIRV_ASM)
+    return amber_converter.ShaderJobFile("variant", json_path, None, "")
+
+
+def test_uniform_buffer_def_and_bind() -> None:
+    uniforms = {
+        "resolution": {"func": "glUniform2f", "args": [256.0, 256.0], "binding": 0},
+        "injection": {"func": "glUniform1i", "args": [3], "push_constant": True},
+    }
+
+    assert amber_converter.amberscript_uniform_buffer_def(uniforms, "variant") == (
+        "# uniforms for variant\n"
+        "\n"
+        "# resolution\n"
+        "BUFFER variant_resolution DATA_TYPE vec2<float> STD140 DATA\n"
+        " 256.0 256.0\n"
+        "END\n"
+        "# injection\n"
+        "BUFFER variant_injection DATA_TYPE int32 STD140 DATA\n"
+        " 3\n"
+        "END\n"
+    )
+
+    assert amber_converter.amberscript_uniform_buffer_bind(uniforms, "variant") == (
+        "  BIND BUFFER variant_resolution AS uniform DESCRIPTOR_SET 0 BINDING 0\n"
+        "  BIND BUFFER variant_injection AS push_constant\n"
+    )
+
+
+def test_compute_shader_job_without_uniforms(tmp_path: Path) -> None:
+    shader_job_file = write_shader_job(
+        tmp_path,
+        {
+            "$compute": {
+                "num_groups": [1, 2, 3],
+                "buffer": {"binding": 0, "fields": [{"type": "int", "data": [0]}]},
+            }
+        },
+        [".comp"],
+    )
+
+    shader_job = shader_job_file.to_shader_job()
+
+    # The special keys are not uniforms, but the (empty) uniforms section is still generated.
+    assert shader_job.uniform_definitions == "# uniforms for variant\n\n"
+    assert shader_job.uniform_bindings == ""
+
+
+def test_graphics_shader_job_with_only_grid(tmp_path: Path) -> None:
+    shader_job_file = write_shader_job(
+        tmp_path, {"$grid": {"dimensions": [2, 3]}}, [".frag"]
+    )
+
+    shader_job = shader_job_file.to_shader_job()
+
+    assert isinstance(shader_job, amber_converter.GraphicsShaderJob)
+    assert shader_job.uniform_definitions == "# uniforms for variant\n\n"
+    assert shader_job.uniform_bindings == ""
+    assert shader_job.draw_command == "DRAW_GRID POS 0 0 SIZE 256 256 CELLS 2 3"
+
+
+def test_graphics_shader_job_with_empty_json(tmp_path: Path) -> None:
+    shader_job_file = write_shader_job(tmp_path, {}, [".frag"])
+
+    shader_job = shader_job_file.to_shader_job()
+
+    assert shader_job.uniform_definitions == ""
+    assert shader_job.uniform_bindings == ""
+
+
+def test_amber_script_header_depends_on_all_settings() -> None:
+    settings = amber_converter.AmberfySettings(
+        short_description="a", spirv_opt_args=["-O"], use_default_fence_timeout=True
+    )
+    header = amber_converter.get_amber_script_header(settings)
+    assert header == (
+        "#!amber\n"
+        "\n"
+        "# Short description: a\n"
+        "\n"
+        "# Optimized using spirv-opt with the following arguments:\n"
+        "# '-O'\n"
+        "\n"
+        "\n"
+    )
+
+    # Equal settings give the same (cached) header.
+    assert amber_converter.get_amber_script_header(settings.copy()) == header
+
+    # Changing any setting that affects the header changes the header.
+    other_settings = settings.copy()
+    other_settings.spirv_opt_args = ["-Os"]
+    assert amber_converter.get_amber_script_header(other_settings) != header
+    other_settings = settings.copy()
+    other_settings.use_default_fence_timeout = False
+    assert amber_converter.get_amber_script_header(other_settings) != header
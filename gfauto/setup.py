@@ -14,11 +14,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+
 try:
     from setuptools import setup, Extension
 except Exception:
     from distutils.core import setup, Extension
 
+# Set GFAUTO_CYTHONIZE=1 to compile the Amber converter with Cython, which speeds up the conversion of shader jobs
+# to AmberScript. The module is compiled from its .py source; without the variable, only the pure Python module is
+# installed. This is opt-in because an in-place build (e.g. an editable install) would shadow the .py file.
+ext_modules = []
+if os.environ.get("GFAUTO_CYTHONIZE"):
+    try:
+        from Cython.Build import cythonize
+    except ImportError as ex:
+        raise ImportError(
+            "GFAUTO_CYTHONIZE is set but Cython is not installed; install Cython or unset GFAUTO_CYTHONIZE."
+        ) from ex
+
+    ext_modules = cythonize(["gfauto/amber_converter.py"], language_level=3)
+
 
 setup(
     name="gfauto",
@@ -38,6 +54,7 @@ setup(
         'dataclasses;python_version<"3.7"',
     ],
     package_data={"gfauto": ["*.proto", "*.pyi"]},
+    ext_modules=ext_modules,
     classifiers=[
         "Environment :: Console",
         "Intended Audience :: Developers",